@@ -20,10 +20,15 @@ Cache:        /tmp/claude-statusline/
 Homepage:     https://github.com/dkh-ai/claude-code-statusline
 """
 
-import sys, json, os, subprocess, time, fcntl, shutil, signal
+import sys, json, os, time, functools
+from collections import defaultdict
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
+def _dumps_line(obj):
+    """Compact JSON + newline as bytes: one JSONL record for an "ab" append."""
+    return (json.dumps(obj, separators=(",", ":")) + "\n").encode()
+
 # ═══════════════════════ CONFIG ═══════════════════════
 
 CACHE_DIR = Path("/tmp/claude-statusline")
@@ -138,18 +143,19 @@ def osc8(url, txt):
 
 # ═══════════════════════ HELPERS ═══════════════════════
 
+@functools.lru_cache(maxsize=64)
 def fmt_tok(t):
     """Format tokens: 128k, 1.9M, 21M. Smart rounding for 1-9.9M range."""
     t = max(0, int(t))
-    if t >= 10_000_000:
-        return f"{t // 1_000_000}M"
-    if t >= 1_000_000:
-        m = t / 1_000_000
-        s = f"{m:.1f}".rstrip("0").rstrip(".")
-        return f"{s}M"
-    if t >= 1000:
+    # Smallest regime first: most counts rendered are < 1M
+    if t < 1000:
+        return str(t)
+    if t < 1_000_000:
         return f"{t // 1000}k"
-    return str(t)
+    if t < 10_000_000:
+        s = f"{t / 1_000_000:.1f}".rstrip("0").rstrip(".")
+        return f"{s}M"
+    return f"{t // 1_000_000}M"
 
 def bar(pct, fc, ec, w=10):
     """Progress bar: filled/empty chars, width."""
@@ -157,8 +163,18 @@ def bar(pct, fc, ec, w=10):
     f = pct * w // 100
     if pct > 0 and f == 0:
         f = 1
+    lut = _BAR_LUT.get((fc, ec, w))
+    if lut:
+        return lut[f]
     return fc * f + ec * (w - f)
 
+# Prebuilt bars for the palettes/widths the line builders use (after load_config)
+_BAR_LUT = {
+    (fc, ec, w): [fc * f + ec * (w - f) for f in range(w + 1)]
+    for fc, ec in (SYM_CTX, SYM_LIM) for w in (6, 10)
+}
+
+@functools.lru_cache(maxsize=64)
 def pie(p):
     """Pie chart icon by percentage using SYM_PIE."""
     if p <= 20: return SYM_PIE[0]
@@ -167,6 +183,10 @@ def pie(p):
     if p <= 80: return SYM_PIE[3]
     return SYM_PIE[4]
 
+# Sparkline levels are quantized to 0..252 (= 7 * 36) so level // 36 equals the
+# 8-step bucket; one translate() then maps every level to its block element.
+_SPARK_LUT = str.maketrans({i: SPARK[i // 36] for i in range(253)})
+
 def sparkline(values):
     """Sparkline from numeric values using Unicode block elements."""
     if not values or all(v == 0 for v in values):
@@ -174,7 +194,8 @@ def sparkline(values):
     mn = min(values)
     mx = max(values)
     rng = mx - mn if mx > mn else 1
-    return "".join(SPARK[min(7, int((v - mn) / rng * 7))] for v in values)
+    levels = bytes([min(252, int((v - mn) / rng * 252)) for v in values])
+    return levels.decode("latin-1").translate(_SPARK_LUT)
 
 def fmtdur(ms):
     """Format duration: 2h14m or 14m."""
@@ -182,6 +203,7 @@ def fmtdur(ms):
     h, m = s // 3600, s % 3600 // 60
     return f"{h}h{m:02d}m" if h else f"{m}m"
 
+@functools.lru_cache(maxsize=64)
 def model_family(mid):
     """Detect model family from model ID."""
     mid_l = mid.lower()
@@ -194,6 +216,13 @@ def parse_iso(s):
     """Parse ISO 8601 to datetime (UTC). Handles Z, +00:00, fractional sec."""
     if not s or s in ("null", ""):
         return None
+    if isinstance(s, str):
+        return _parse_iso_cached(s)
+    return None
+
+@functools.lru_cache(maxsize=128)
+def _parse_iso_cached(s):
+    """parse_iso for non-empty strings; resets_at values repeat across renders."""
     try:
         return datetime.fromisoformat(s.replace("Z", "+00:00"))
     except (ValueError, AttributeError):
@@ -211,11 +240,16 @@ def parse_iso(s):
 
 def detect_cols():
     """Detect terminal width with safe fallbacks."""
-    # Env var override (highest priority)
+    # Env var override (highest priority), never touches /dev/tty
     for env in ("STATUSLINE_COLS", "COLUMNS"):
         v = os.environ.get(env, "")
         if v.isdigit() and int(v) > 0:
             return int(v)
+    return _tty_cols()
+
+@functools.lru_cache(maxsize=1)
+def _tty_cols():
+    """Width of the controlling terminal, probed once per process."""
     # Try /dev/tty for real terminal width (works in pipes)
     try:
         fd = os.open("/dev/tty", os.O_RDONLY)
@@ -231,13 +265,23 @@ def detect_cols():
 
 # ═══════════════════════ CACHE ═══════════════════════
 
-def is_stale(path, ttl):
-    if not path.exists():
+def _stat_or_none(path):
+    """Single stat() call; None if the file is missing or unreadable."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def is_stale(path, ttl, st=None):
+    """True if path is missing or older than ttl. st: optional pre-fetched stat result."""
+    st = st or _stat_or_none(path)
+    if st is None:
         return True
-    return time.time() - path.stat().st_mtime > ttl
+    return time.time() - st.st_mtime > ttl
 
 def try_lock(path):
     """Non-blocking exclusive lock. Returns fd or None."""
+    import fcntl
     try:
         fd = os.open(str(path), os.O_CREAT | os.O_WRONLY)
         fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
@@ -246,6 +290,7 @@ def try_lock(path):
         return None
 
 def unlock(fd, path):
+    import fcntl
     try:
         fcntl.flock(fd, fcntl.LOCK_UN)
         os.close(fd)
@@ -253,70 +298,105 @@ def unlock(fd, path):
     except OSError:
         pass
 
-def rjson(path):
-    """Safely read JSON from file."""
+_JSON_CACHE = {}  # path -> ((mtime_ns, size), data)
+ORJSON_MIN_SIZE = 64 * 1024  # Below this, importing orjson costs more than it saves
+
+@functools.lru_cache(maxsize=1)
+def _big_loads():
+    """JSON decoder for large caches: orjson if installed, else stdlib."""
     try:
-        if path.exists() and path.stat().st_size > 0:
-            return json.loads(path.read_text())
+        import orjson  # Lazy import to avoid overhead
+        return orjson.loads
+    except ImportError:
+        return json.loads
+
+def rjson(path, st=None):
+    """Safely read JSON from file. Memoized until the file's mtime or size changes.
+
+    st: optional pre-fetched stat result, saves a stat() when the caller has one.
+    """
+    st = st or _stat_or_none(path)
+    if st is None or st.st_size == 0:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _JSON_CACHE.get(path)
+    if hit and hit[0] == key:
+        return hit[1]
+    try:
+        loads = _big_loads() if st.st_size > ORJSON_MIN_SIZE else json.loads
+        data = loads(path.read_bytes())
     except Exception:
-        pass
-    return None
+        return None
+    _JSON_CACHE[path] = (key, data)
+    return data
 
 def ensure(path, ttl, fn, bg_if_stale=False):
     """Ensure cache is fresh. Lock prevents concurrent refreshes.
 
     bg_if_stale: if True and cache exists but stale, refresh in background.
     """
-    if not is_stale(path, ttl):
-        return rjson(path)
+    st = _stat_or_none(path)
+    if not is_stale(path, ttl, st):
+        return rjson(path, st)
 
     lk = path.with_suffix(".lock")
 
     # Clean stale locks (>120s)
-    if lk.exists():
+    lk_st = _stat_or_none(lk)
+    if lk_st and time.time() - lk_st.st_mtime > 120:
         try:
-            if time.time() - lk.stat().st_mtime > 120:
-                lk.unlink(missing_ok=True)
+            lk.unlink(missing_ok=True)
         except OSError:
             pass
 
     fd = try_lock(lk)
     if fd is None:
-        return rjson(path)  # Another process refreshing
+        return rjson(path, st)  # Another process refreshing
 
-    if bg_if_stale and path.exists():
-        # Background refresh: release lock, spawn child
+    if bg_if_stale and st is not None:
+        # Background refresh: release lock, spawn child; serve the stale copy
         unlock(fd, lk)
         _bg_refresh(path, fn)
-    else:
-        # Synchronous refresh (first run or small TTL)
-        try:
-            fn(path)
-        finally:
-            unlock(fd, lk)
+        return rjson(path, st)
+
+    # Synchronous refresh (first run or small TTL)
+    try:
+        fn(path)
+    finally:
+        unlock(fd, lk)
 
     return rjson(path)
 
 def _bg_refresh(path, fn):
     """Background refresh using fork. Child refreshes and exits."""
     lk = path.with_suffix(".bglock")
-    # Skip if background refresh already running
-    if lk.exists():
+    # Atomic acquire; a lock younger than 60s means a refresh is already running
+    for _ in range(2):
         try:
-            if time.time() - lk.stat().st_mtime < 60:
+            fd = os.open(str(lk), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            break
+        except FileExistsError:
+            st = _stat_or_none(lk)
+            if st and time.time() - st.st_mtime < 60:
+                return
+            try:
+                lk.unlink(missing_ok=True)  # Stale lock: remove and retry once
+            except OSError:
                 return
         except OSError:
-            pass
-
-    try:
-        lk.write_text(str(os.getpid()))
-    except OSError:
+            return
+    else:
         return
+    try:
+        os.write(fd, str(os.getpid()).encode())
+    finally:
+        os.close(fd)
 
     pid = os.fork()
     if pid == 0:
         # Child process with hard timeout
         try:
+            import signal
             os.setsid()
             signal.alarm(45)  # Kill child after 45s no matter what
             fn(path)
@@ -329,6 +409,32 @@ def _bg_refresh(path, fn):
 
 # ═══════════════════════ REFRESH FUNCTIONS ═══════════════════════
 
+_SSL_CTX = None
+
+def _http_open(url, headers=None, timeout=10):
+    """HTTPS GET in-process, returns the open response. Raises on network/HTTP errors (incl. 304).
+
+    The SSL context is created once and shared, so refreshes running under
+    prewarm_caches don't each reload the CA bundle. Lazy import to avoid overhead.
+    """
+    global _SSL_CTX
+    import ssl, urllib.request
+    if _SSL_CTX is None:
+        _SSL_CTX = ssl.create_default_context()
+    req = urllib.request.Request(url, headers=headers or {})
+    return urllib.request.urlopen(req, timeout=timeout, context=_SSL_CTX)
+
+def _http_get(url, headers=None, timeout=10):
+    """HTTPS GET in-process, returns body bytes."""
+    with _http_open(url, headers, timeout) as resp:
+        return resp.read()
+
+@functools.lru_cache(maxsize=None)
+def _which(name):
+    """shutil.which, memoized: binaries don't move during a render."""
+    import shutil
+    return shutil.which(name)
+
 def get_oauth_token():
     """Get OAuth token from platform keychain or env var."""
     # Environment override (works everywhere)
@@ -336,6 +442,8 @@ def get_oauth_token():
     if env_tok:
         return env_tok
 
+    import subprocess
+
     try:
         if sys.platform == "darwin":
             r = subprocess.run(
@@ -343,7 +451,7 @@ def get_oauth_token():
                 capture_output=True, text=True, timeout=5)
         elif sys.platform.startswith("linux"):
             # libsecret / GNOME Keyring via secret-tool
-            if not shutil.which("secret-tool"):
+            if not _which("secret-tool"):
                 return None
             r = subprocess.run(
                 ["secret-tool", "lookup", "service", "Claude Code-credentials"],
@@ -375,54 +483,118 @@ def refresh_limits(cf):
         token = get_oauth_token()
         if not token:
             return
-        r = subprocess.run([
-            "curl", "-sf", "--connect-timeout", "5", "--max-time", "10",
-            "-H", f"Authorization: Bearer {token}",
-            "-H", "anthropic-beta: oauth-2025-04-20",
-            "https://api.anthropic.com/api/oauth/usage"
-        ], capture_output=True, text=True, timeout=15)
-        if r.returncode == 0 and r.stdout.strip():
+        body = _http_get("https://api.anthropic.com/api/oauth/usage", {
+            "Authorization": f"Bearer {token}",
+            "anthropic-beta": "oauth-2025-04-20",
+        })
+        if body.strip():
             tmp = cf.with_suffix(".tmp")
-            tmp.write_text(r.stdout)
+            tmp.write_bytes(body)
             tmp.rename(cf)
     except Exception:
         pass
 
+def ccusage_args():
+    """ccusage command line for the last 30 days, or None if no runner is installed."""
+    cmd = None
+    if _which("ccusage"):
+        cmd = ["ccusage"]
+    elif _which("bunx"):
+        cmd = ["bunx", "ccusage"]
+    elif _which("npx"):
+        cmd = ["npx", "-y", "ccusage"]
+    if not cmd:
+        return None
+
+    now = datetime.now()
+    since = (now - timedelta(days=30)).strftime("%Y%m%d")
+    until = now.strftime("%Y%m%d")
+    return cmd + ["daily", "--json", "--instances", "--since", since, "--until", until, "--mode", "calculate"]
+
+def _write_ccusage(cf, out):
+    """Atomically replace the ccusage cache with CLI output (bytes), if any."""
+    if out.strip():
+        tmp = cf.with_suffix(".tmp")
+        tmp.write_bytes(out)
+        tmp.rename(cf)
+
 def refresh_ccusage(cf):
     """Fetch daily usage from ccusage CLI."""
     try:
-        cmd = None
-        if shutil.which("ccusage"):
-            cmd = ["ccusage"]
-        elif shutil.which("bunx"):
-            cmd = ["bunx", "ccusage"]
-        elif shutil.which("npx"):
-            cmd = ["npx", "-y", "ccusage"]
-        if not cmd:
+        args = ccusage_args()
+        if not args:
             return
 
-        since = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
-        until = datetime.now().strftime("%Y%m%d")
-        args = cmd + ["daily", "--json", "--instances", "--since", since, "--until", until, "--mode", "calculate"]
-
-        r = subprocess.run(args, capture_output=True, text=True, timeout=30)
-        if r.returncode == 0 and r.stdout.strip():
-            tmp = cf.with_suffix(".tmp")
-            tmp.write_text(r.stdout)
-            tmp.rename(cf)
+        import subprocess
+        r = subprocess.run(args, capture_output=True, timeout=30)
+        if r.returncode == 0:
+            _write_ccusage(cf, r.stdout)
     except Exception:
         pass
 
+async def refresh_ccusage_async(cf):
+    """refresh_ccusage as an asyncio subprocess, so prewarm_caches can overlap it."""
+    import asyncio  # Lazy import to avoid overhead
+    args = ccusage_args()
+    if not args:
+        return
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    try:
+        out, _ = await asyncio.wait_for(proc.communicate(), 30)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return
+    if proc.returncode == 0:
+        _write_ccusage(cf, out)
+
+PRICING_FIELDS = ("input_cost_per_token", "output_cost_per_token",
+                  "cache_creation_input_token_cost", "cache_read_input_token_cost")
+
 def refresh_pricing(cf):
-    """Fetch model pricing from LiteLLM GitHub (24h cache)."""
+    """Fetch model pricing from LiteLLM GitHub (24h cache).
+
+    Only Claude entries and the fields get_pricing reads are kept, which shrinks
+    the cache ~100x and with it the parse cost on every render. Conditional GET:
+    ETag / Last-Modified from the previous fetch live in a .lastmod sidecar, and
+    a 304 just touches the cache file.
+    """
+    meta_f = cf.with_suffix(".lastmod")
+    headers = {}
+    if cf.exists():
+        meta = rjson(meta_f) or {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
     try:
-        r = subprocess.run([
-            "curl", "-sf", "--connect-timeout", "5", "--max-time", "10", LITELLM_URL
-        ], capture_output=True, text=True, timeout=15)
-        if r.returncode == 0 and r.stdout.strip():
+        import urllib.error
+        try:
+            with _http_open(LITELLM_URL, headers) as resp:
+                body = resp.read()
+                meta = {"etag": resp.headers.get("ETag"),
+                        "last_modified": resp.headers.get("Last-Modified")}
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                os.utime(cf, None)  # Unchanged upstream: restart the TTL
+            return
+
+        parsed = json.loads(body)
+        if not isinstance(parsed, dict):
+            return
+        trimmed = {
+            k: {f: v[f] for f in PRICING_FIELDS if f in v}
+            for k, v in parsed.items()
+            if "claude" in k.lower() and isinstance(v, dict)
+        }
+        if trimmed:
             tmp = cf.with_suffix(".tmp")
-            tmp.write_text(r.stdout)
+            tmp.write_bytes(_dumps_line(trimmed))
             tmp.rename(cf)
+            # Validators only after the cache is in place, else a 304 would pin a stale table
+            meta_f.write_bytes(_dumps_line(meta))
     except Exception:
         pass
 
@@ -503,11 +675,14 @@ def build_line1(data, tier=2):
 
     return ml, line
 
-def build_line2(tier=2):
+def build_line2(tier=2, now_utc=None):
     """Line 2: 5h limit + reset, weekly % + model sub-limits, 1d/7d/30d costs + sparkline.
 
     tier: 0=ultra, 1=compact, 2=full.
+    now_utc: render timestamp (aware, UTC); defaults to now.
     """
+    now_utc = now_utc or datetime.now(timezone.utc)
+
     # ── Limits ──
     lim = ensure(CACHE_DIR / "limits.json", LIMITS_TTL, refresh_limits)
 
@@ -518,7 +693,7 @@ def build_line2(tier=2):
         ht = ""
         dt = parse_iso(h5r)
         if dt:
-            diff = max(0, (dt - datetime.now(timezone.utc)).total_seconds())
+            diff = max(0, (dt - now_utc).total_seconds())
             ht = f" {int(diff)//3600}:{int(diff)%3600//60:02d}"
 
         w7p = int(lim.get("seven_day", {}).get("utilization", 0))
@@ -561,27 +736,20 @@ def build_line2(tier=2):
                 arr = raw.get("daily") or raw.get("data") or []
 
         if arr:
-            today = datetime.now().strftime("%Y-%m-%d")
-            d7 = (datetime.now() - timedelta(days=6)).strftime("%Y-%m-%d")
-            d30 = (datetime.now() - timedelta(days=29)).strftime("%Y-%m-%d")
-
-            def agg_cost(from_date):
-                return sum(
-                    (e.get("totalCost", e.get("cost", 0)) or 0)
-                    for e in arr if from_date <= e.get("date", "") <= today
-                )
-
-            dc, wc, mc = agg_cost(today), agg_cost(d7), agg_cost(d30)
+            # Index cost by date once; windows are then plain dict lookups
+            by_day = defaultdict(float)
+            for e in arr:
+                by_day[e.get("date", "")] += e.get("totalCost", e.get("cost", 0)) or 0
+
+            now = now_utc.astimezone()  # ccusage dates are local
+            last30 = [(now - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(29, -1, -1)]
+            daily_costs = [by_day.get(d, 0.0) for d in last30[-7:]]
+            dc = daily_costs[-1]
+            wc = sum(daily_costs)
+            mc = sum(by_day.get(d, 0.0) for d in last30)
 
             # Sparkline: daily costs for last 7 days
             spark = ""
-            daily_costs = []
-            for i in range(6, -1, -1):
-                d = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-                daily_costs.append(sum(
-                    (e.get("totalCost", e.get("cost", 0)) or 0)
-                    for e in arr if e.get("date", "") == d
-                ))
             if any(c > 0 for c in daily_costs):
                 spark = f" {DM}{sparkline(daily_costs)}{R}"
 
@@ -598,8 +766,11 @@ def build_line2(tier=2):
 
 # ═══════════════════════ SESSION LOG ═══════════════════════
 
-def log_session(data):
-    """Append session snapshot to JSONL log. Max one entry per minute."""
+def log_session(data, now_utc=None):
+    """Append session snapshot to JSONL log. Max one entry per minute.
+
+    now_utc: render timestamp (aware, UTC); defaults to now.
+    """
     ts_f = CACHE_DIR / "session_last_ts.txt"
     try:
         if ts_f.exists():
@@ -614,28 +785,41 @@ def log_session(data):
     tin = data.get("context_window", {}).get("total_input_tokens", 0)
     tout = data.get("context_window", {}).get("total_output_tokens", 0)
 
-    entry = json.dumps({
-        "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    entry = _dumps_line({
+        "ts": (now_utc or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%SZ"),
         "m": model_family(mid),
         "c": round(cost, 2),
         "t": tin + tout,
         "d": dur,
         "p": Path.cwd().name,
-    }, separators=(",", ":"))
+    })
 
     try:
         log_f = CACHE_DIR / "sessions.jsonl"
-        with open(log_f, "a") as f:
-            f.write(entry + "\n")
+        with open(log_f, "ab") as f:
+            f.write(entry)
         ts_f.write_text(str(time.time()))
         # Rotate if too large
         if log_f.stat().st_size > 500_000:
-            lines = log_f.read_text().splitlines()
-            if len(lines) > SESSION_LOG_MAX:
-                log_f.write_text("\n".join(lines[-SESSION_LOG_MAX:]) + "\n")
+            trim_log(log_f, SESSION_LOG_MAX)
     except Exception:
         pass
 
+def trim_log(log_f, keep):
+    """Keep the last `keep` lines, reading only a bounded tail (~256 bytes/line)."""
+    chunk = 256 * keep
+    with open(log_f, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - chunk))
+        lines = f.read().splitlines()
+    if size > chunk:
+        lines = lines[1:]  # First line of the tail is likely partial
+    elif len(lines) <= keep:
+        return
+    tmp = log_f.with_suffix(".tmp")
+    tmp.write_bytes(b"\n".join(lines[-keep:]) + b"\n")
+    os.replace(tmp, log_f)
+
 def show_stats():
     """Show session statistics from JSONL log. Called via --stats flag."""
     log_f = CACHE_DIR / "sessions.jsonl"
@@ -643,12 +827,16 @@ def show_stats():
         print("No session log.")
         return
 
+    import mmap
     entries = []
-    for line in log_f.read_text().splitlines():
-        try:
-            entries.append(json.loads(line))
-        except Exception:
-            pass
+    with open(log_f, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b""):
+                    try:
+                        entries.append(json.loads(line))
+                    except Exception:
+                        pass
     if not entries:
         print("Log empty.")
         return
@@ -686,54 +874,47 @@ def show_stats():
 # ═══════════════════════ MAIN ═══════════════════════
 
 def prewarm_caches():
-    """Parallel refresh of missing caches on first run. Lazy import to avoid overhead."""
+    """Parallel refresh of missing caches on first run. Lazy import to avoid overhead.
+
+    Runs on one event loop: ccusage as an asyncio subprocess, the in-process
+    HTTP refreshes in the loop's executor alongside it.
+    """
+    async def in_executor(fn, path):
+        await asyncio.get_running_loop().run_in_executor(None, fn, path)
+
+    # (path, ttl, coroutine factory): the HTTP refreshes run in the loop's executor
     caches = [
-        (CACHE_DIR / "pricing.json", PRICING_TTL, refresh_pricing),
-        (CACHE_DIR / "limits.json", LIMITS_TTL, refresh_limits),
-        (CACHE_DIR / "ccusage.json", CCUSAGE_TTL, refresh_ccusage),
+        (CACHE_DIR / "pricing.json", PRICING_TTL, lambda p: in_executor(refresh_pricing, p)),
+        (CACHE_DIR / "limits.json", LIMITS_TTL, lambda p: in_executor(refresh_limits, p)),
+        (CACHE_DIR / "ccusage.json", CCUSAGE_TTL, refresh_ccusage_async),
     ]
-    jobs = [(p, fn) for p, ttl, fn in caches if is_stale(p, ttl) and not p.exists()]
+    jobs = [(p, refresh) for p, ttl, refresh in caches if is_stale(p, ttl) and not p.exists()]
     if not jobs:
         return
 
-    from concurrent.futures import ThreadPoolExecutor
+    import asyncio
 
-    def do_refresh(path, fn):
+    async def do_refresh(path, refresh):
         lk = path.with_suffix(".lock")
         fd = try_lock(lk)
         if fd is None:
             return
         try:
-            fn(path)
+            await refresh(path)
         finally:
             unlock(fd, lk)
 
-    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
-        futs = [pool.submit(do_refresh, p, f) for p, f in jobs]
-        for fut in futs:
-            try:
-                fut.result(timeout=30)
-            except Exception:
-                pass
-
-def main():
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-    # CLI: --stats shows session log summary
-    if len(sys.argv) > 1 and sys.argv[1] == "--stats":
-        show_stats()
-        return
+    async def run_all():
+        await asyncio.gather(*(do_refresh(p, f) for p, f in jobs), return_exceptions=True)
 
     try:
-        data = json.load(sys.stdin)
-    except (json.JSONDecodeError, ValueError):
-        return
-
-    # Parallel prewarm on cold start (first run)
-    prewarm_caches()
+        asyncio.run(run_all())
+    except Exception:
+        pass
 
+def render(data, cols, now_utc):
+    """Build both lines for a stdin payload."""
     # Three-tier layout detection
-    cols = detect_cols()
     if cols < ULTRA_COLS:
         tier = 0
     elif cols < COMPACT_COLS:
@@ -750,16 +931,43 @@ def main():
 
     # Line 2 — limits + spending
     try:
-        l2 = build_line2(tier)
+        l2 = build_line2(tier, now_utc)
     except Exception:
         l2 = "5h: — | wk: — | 1d: — 7d: — 30d: —"
 
-    print(l1)
-    print(l2)
+    return l1, l2
+
+def main():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    # CLI: --stats shows session log summary
+    if len(sys.argv) > 1 and sys.argv[1] == "--stats":
+        show_stats()
+        return
+
+    raw = sys.stdin.buffer.read()
+    cols = detect_cols()
+
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return
+
+    # Parallel prewarm on cold start (first run). One scandir answers "all present?"
+    # so the steady state skips the per-file probes in prewarm_caches.
+    with os.scandir(CACHE_DIR) as it:
+        present = {e.name for e in it}
+    if not present.issuperset(("pricing.json", "limits.json", "ccusage.json")):
+        prewarm_caches()
+
+    now_utc = datetime.now(timezone.utc)
+    l1, l2 = render(data, cols, now_utc)
+    sys.stdout.write(f"{l1}\n{l2}\n")
+    sys.stdout.flush()
 
     # Session log (non-blocking, max 1/min)
     try:
-        log_session(data)
+        log_session(data, now_utc=now_utc)
     except Exception:
         pass
 
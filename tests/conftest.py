@@ -0,0 +1,6 @@
+"""pytest setup: make statusline.py importable from the project root."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
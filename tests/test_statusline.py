@@ -1,90 +1,125 @@
 """Unit tests for statusline.py (Python 3, pytest)."""
 
-import importlib.util
-import importlib.machinery
 import json
 import os
-import sys
-import tempfile
-import time
-from datetime import datetime, timezone
-from pathlib import Path
+import random
+import re
+import urllib.error
+from datetime import date, datetime, timedelta, timezone
+from types import MappingProxyType
 from unittest.mock import patch
 
-# Load statusline module from project root
-_script_path = str(Path(__file__).resolve().parent.parent / "statusline.py")
-_loader = importlib.machinery.SourceFileLoader("statusline", _script_path)
-spec = importlib.util.spec_from_loader("statusline", _loader, origin=_script_path)
-sl = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(sl)
+import pytest
 
+import statusline as sl  # Project root is put on sys.path by conftest.py
 
-# ═══════════════════════ fmt_tok ═══════════════════════
-
-class TestFmtTok:
-    def test_zero(self):
-        assert sl.fmt_tok(0) == "0"
+# SGR color codes emitted by statusline; strip before asserting plain text
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
 
-    def test_small(self):
-        assert sl.fmt_tok(500) == "500"
+# Read-only stdin payload shared by the build_line1 tests
+_MOCK_DATA = MappingProxyType({
+    "model": {"id": "claude-opus-4-6-20250514", "display_name": "Opus"},
+    "context_window": {
+        "context_window_size": 200000,
+        "current_usage": {
+            "input_tokens": 50000,
+            "output_tokens": 10000,
+            "cache_creation_input_tokens": 20000,
+            "cache_read_input_tokens": 5000,
+        },
+        "total_input_tokens": 100000,
+        "total_output_tokens": 30000,
+    },
+    "cost": {"total_cost_usd": 3.50, "total_duration_ms": 1200000},
+})
+# Markers every build_line1 tier renders: session cost and remaining tokens
+_LINE1_TOKENS = ("ses:", "▼")
 
-    def test_thousands(self):
-        assert sl.fmt_tok(1000) == "1k"
-        assert sl.fmt_tok(128000) == "128k"
-        assert sl.fmt_tok(999999) == "999k"
+# Canonical limits.json for build_line2 tests, encoded once
+_LIMITS_BASE = {
+    "five_hour": {"utilization": 40, "resets_at": "2099-12-31T23:59:59Z"},
+    "seven_day": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
+}
+_LIMITS_BASE_BYTES = json.dumps(_LIMITS_BASE).encode()
 
-    def test_millions_fractional(self):
-        assert sl.fmt_tok(1_000_000) == "1M"
-        assert sl.fmt_tok(1_900_000) == "1.9M"
-        assert sl.fmt_tok(2_500_000) == "2.5M"
-        assert sl.fmt_tok(9_999_999) == "10M"
 
-    def test_millions_large(self):
-        assert sl.fmt_tok(10_000_000) == "10M"
-        assert sl.fmt_tok(21_000_000) == "21M"
-        assert sl.fmt_tok(115_000_000) == "115M"
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point sl.CACHE_DIR at a per-test tmp dir (auto-cleaned by pytest)."""
+    monkeypatch.setattr(sl, "CACHE_DIR", tmp_path)
+    return tmp_path
 
-    def test_negative(self):
-        assert sl.fmt_tok(-100) == "0"
 
+@pytest.fixture
+def offline(monkeypatch):
+    """Stub the cache refreshers so build_line2 never shells out or fetches."""
+    monkeypatch.setattr(sl, "refresh_limits", lambda cf: None)
+    monkeypatch.setattr(sl, "refresh_ccusage", lambda cf: None)
 
-# ═══════════════════════ bar ═══════════════════════
 
-class TestBar:
-    def test_zero(self):
-        assert sl.bar(0, "█", "░", 5) == "░░░░░"
-
-    def test_full(self):
-        assert sl.bar(100, "█", "░", 5) == "█████"
+# ═══════════════════════ fmt_tok ═══════════════════════
 
-    def test_half(self):
-        assert sl.bar(50, "█", "░", 10) == "█████░░░░░"
+class TestFmtTok:
+    @pytest.mark.parametrize("n,expected", [
+        (0, "0"),
+        (500, "500"),
+        (1000, "1k"),
+        (128000, "128k"),
+        (999999, "999k"),
+        (1_000_000, "1M"),
+        (1_900_000, "1.9M"),
+        (2_500_000, "2.5M"),
+        (9_999_999, "10M"),
+        (10_000_000, "10M"),
+        (21_000_000, "21M"),
+        (115_000_000, "115M"),
+        (-100, "0"),
+    ])
+    def test_fmt_tok(self, n, expected):
+        assert sl.fmt_tok(n) == expected
+
+    @pytest.mark.parametrize("n,expected", [
+        (999, "999"),
+        (1001, "1k"),
+        (1_049_999, "1M"),       # rounds down to 1.0 → "1M"
+        (1_050_000, "1.1M"),
+        (9_949_999, "9.9M"),
+        (9_950_000, "9.9M"),
+        (10_999_999, "10M"),     # >= 10M truncates, no decimal
+        ("42", "42"),
+        (1.9e6, "1.9M"),
+    ])
+    def test_regime_boundaries(self, n, expected):
+        assert sl.fmt_tok(n) == expected
 
-    def test_min_one_filled(self):
-        # >0% should show at least 1 filled char
-        assert sl.bar(1, "█", "░", 10) == "█░░░░░░░░░"
 
-    def test_over_100_clamped(self):
-        assert sl.bar(150, "█", "░", 5) == "█████"
+# ═══════════════════════ bar ═══════════════════════
 
-    def test_custom_chars(self):
-        assert sl.bar(60, "◆", "◇", 5) == "◆◆◆◇◇"
+class TestBar:
+    @pytest.mark.parametrize("pct,fc,ec,w,expected", [
+        (0, "█", "░", 5, "░░░░░"),
+        (100, "█", "░", 5, "█████"),
+        (50, "█", "░", 10, "█████░░░░░"),
+        (1, "█", "░", 10, "█░░░░░░░░░"),   # >0% shows at least 1 filled char
+        (150, "█", "░", 5, "█████"),        # clamped
+        (60, "◆", "◇", 5, "◆◆◆◇◇"),        # custom chars
+    ])
+    def test_bar(self, pct, fc, ec, w, expected):
+        assert sl.bar(pct, fc, ec, w) == expected
 
 
 # ═══════════════════════ pie ═══════════════════════
 
 class TestPie:
-    def test_thresholds(self):
-        assert sl.pie(0) == "○"
-        assert sl.pie(20) == "○"
-        assert sl.pie(21) == "◔"
-        assert sl.pie(40) == "◔"
-        assert sl.pie(41) == "◑"
-        assert sl.pie(60) == "◑"
-        assert sl.pie(61) == "◕"
-        assert sl.pie(80) == "◕"
-        assert sl.pie(81) == "●"
-        assert sl.pie(100) == "●"
+    @pytest.mark.parametrize("p,expected", [
+        (0, "○"), (20, "○"),
+        (21, "◔"), (40, "◔"),
+        (41, "◑"), (60, "◑"),
+        (61, "◕"), (80, "◕"),
+        (81, "●"), (100, "●"),
+    ])
+    def test_thresholds(self, p, expected):
+        assert sl.pie(p) == expected
 
 
 # ═══════════════════════ sparkline ═══════════════════════
@@ -109,87 +144,90 @@ class TestSparkline:
         result = sl.sparkline([0, 100])
         assert result == "▁█"
 
+    def test_matches_reference(self):
+        # Translate fast path must bucket exactly like the plain per-value loop
+        def ref(values):
+            mn, mx = min(values), max(values)
+            rng = mx - mn if mx > mn else 1
+            return "".join(sl.SPARK[min(7, int((v - mn) / rng * 7))] for v in values)
 
-# ═══════════════════════ fmtdur ═══════════════════════
-
-class TestFmtdur:
-    def test_minutes(self):
-        assert sl.fmtdur(60_000) == "1m"
-        assert sl.fmtdur(300_000) == "5m"
+        rnd = random.Random(30)
+        for _ in range(500):
+            values = [rnd.choice((0, rnd.uniform(0, 50), rnd.randint(0, 9))) for _ in range(30)]
+            if any(values):
+                assert sl.sparkline(values) == ref(values)
 
-    def test_hours(self):
-        assert sl.fmtdur(3_600_000) == "1h00m"
-        assert sl.fmtdur(8_040_000) == "2h14m"
 
-    def test_zero(self):
-        assert sl.fmtdur(0) == "0m"
+# ═══════════════════════ fmtdur ═══════════════════════
 
-    def test_negative(self):
-        assert sl.fmtdur(-1000) == "0m"
+class TestFmtdur:
+    @pytest.mark.parametrize("ms,expected", [
+        (60_000, "1m"),
+        (300_000, "5m"),
+        (3_600_000, "1h00m"),
+        (8_040_000, "2h14m"),
+        (0, "0m"),
+        (-1000, "0m"),
+    ])
+    def test_fmtdur(self, ms, expected):
+        assert sl.fmtdur(ms) == expected
 
 
 # ═══════════════════════ model_family ═══════════════════════
 
 class TestModelFamily:
-    def test_opus(self):
-        assert sl.model_family("claude-opus-4-6-20250514") == "opus"
-
-    def test_sonnet(self):
-        assert sl.model_family("claude-sonnet-4-5-20250929") == "sonnet"
-
-    def test_haiku(self):
-        assert sl.model_family("claude-haiku-4-5-20251001") == "haiku"
-
-    def test_unknown_defaults_opus(self):
-        assert sl.model_family("unknown-model-x") == "opus"
+    @pytest.mark.parametrize("mid,expected", [
+        ("claude-opus-4-6-20250514", "opus"),
+        ("claude-sonnet-4-5-20250929", "sonnet"),
+        ("claude-haiku-4-5-20251001", "haiku"),
+        ("unknown-model-x", "opus"),  # unknown defaults to opus
+    ])
+    def test_model_family(self, mid, expected):
+        assert sl.model_family(mid) == expected
 
 
 # ═══════════════════════ parse_iso ═══════════════════════
 
 class TestParseIso:
-    def test_z_suffix(self):
-        dt = sl.parse_iso("2026-02-14T20:30:00Z")
+    @pytest.mark.parametrize("s", [
+        "2026-02-14T20:30:00Z",
+        "2026-02-14T20:30:00+00:00",
+        "2026-02-14T20:30:00.123Z",
+    ])
+    def test_parses_utc(self, s):
+        dt = sl.parse_iso(s)
         assert dt.tzinfo == timezone.utc
-        assert dt.hour == 20
-        assert dt.minute == 30
+        assert (dt.hour, dt.minute) == (20, 30)
 
-    def test_offset(self):
-        dt = sl.parse_iso("2026-02-14T20:30:00+00:00")
-        assert dt is not None
-        assert dt.hour == 20
+    @pytest.mark.parametrize("s", [None, "", "null"])
+    def test_none(self, s):
+        assert sl.parse_iso(s) is None
 
-    def test_none(self):
-        assert sl.parse_iso(None) is None
-        assert sl.parse_iso("") is None
-        assert sl.parse_iso("null") is None
-
-    def test_fractional(self):
-        dt = sl.parse_iso("2026-02-14T20:30:00.123Z")
-        assert dt is not None
-        assert dt.hour == 20
+    def test_parse_iso_memoized(self):
+        s = "2026-02-14T21:45:00Z"
+        first = sl.parse_iso(s)
+        hits = sl._parse_iso_cached.cache_info().hits
+        assert sl.parse_iso(s) == first
+        assert sl._parse_iso_cached.cache_info().hits > hits
 
 
 # ═══════════════════════ detect_cols ═══════════════════════
 
 class TestDetectCols:
-    def test_env_override(self):
-        with patch.dict(os.environ, {"STATUSLINE_COLS": "42"}):
-            assert sl.detect_cols() == 42
-
-    def test_columns_env(self):
-        with patch.dict(os.environ, {"COLUMNS": "99"}, clear=False):
-            # Remove STATUSLINE_COLS if present
-            env = os.environ.copy()
-            env.pop("STATUSLINE_COLS", None)
-            with patch.dict(os.environ, env, clear=True):
-                os.environ["COLUMNS"] = "99"
-                assert sl.detect_cols() == 99
-
-    def test_fallback(self):
-        with patch.dict(os.environ, {}, clear=True):
-            # /dev/tty may or may not work in test env
-            result = sl.detect_cols()
-            assert result > 0
+    def test_env_override(self, monkeypatch):
+        monkeypatch.setenv("STATUSLINE_COLS", "42")
+        assert sl.detect_cols() == 42
+
+    def test_columns_env(self, monkeypatch):
+        monkeypatch.delenv("STATUSLINE_COLS", raising=False)
+        monkeypatch.setenv("COLUMNS", "99")
+        assert sl.detect_cols() == 99
+
+    def test_fallback(self, monkeypatch):
+        for key in ("STATUSLINE_COLS", "COLUMNS"):
+            monkeypatch.delenv(key, raising=False)
+        # /dev/tty may or may not work in test env
+        assert sl.detect_cols() > 0
 
 
 # ═══════════════════════ cpct / ccost ═══════════════════════
@@ -230,65 +268,36 @@ class TestColorize:
 # ═══════════════════════ build_line1 ═══════════════════════
 
 class TestBuildLine1:
-    MOCK_DATA = {
-        "model": {"id": "claude-opus-4-6-20250514", "display_name": "Opus"},
-        "context_window": {
-            "context_window_size": 200000,
-            "current_usage": {
-                "input_tokens": 50000,
-                "output_tokens": 10000,
-                "cache_creation_input_tokens": 20000,
-                "cache_read_input_tokens": 5000,
-            },
-            "total_input_tokens": 100000,
-            "total_output_tokens": 30000,
-        },
-        "cost": {"total_cost_usd": 3.50, "total_duration_ms": 1200000},
-    }
-
-    def setup_method(self):
-        """Use temp cache dir to avoid polluting real cache."""
-        self._orig = sl.CACHE_DIR
-        sl.CACHE_DIR = Path(tempfile.mkdtemp())
-
-    def teardown_method(self):
-        import shutil
-        shutil.rmtree(sl.CACHE_DIR, ignore_errors=True)
-        sl.CACHE_DIR = self._orig
-
-    def test_returns_label_and_line(self):
-        ml, line = sl.build_line1(self.MOCK_DATA)
+    def test_returns_label_and_line(self, cache_dir):
+        ml, line = sl.build_line1(_MOCK_DATA)
         assert ml == "Opus 4.6"
-        assert "ses:" in line
-        assert "▼" in line
+        assert all(t in line for t in _LINE1_TOKENS)
 
-    def test_compact_has_bar_and_remaining(self):
-        ml, line = sl.build_line1(self.MOCK_DATA, tier=1)
-        assert "◆" in line or "◇" in line  # bar present
+    def test_compact_has_bar_and_remaining(self, cache_dir):
+        ml, line = sl.build_line1(_MOCK_DATA, tier=1)
+        assert set("◆◇") & set(line)  # bar present
         assert "▼" in line  # remaining tokens indicator
 
-    def test_ultra_no_bar(self):
-        ml, line = sl.build_line1(self.MOCK_DATA, tier=0)
-        assert "◆" not in line  # no bar
-        assert "◇" not in line
-        assert "▼" in line  # remaining tokens
-        assert "ses:" in line
+    def test_ultra_no_bar(self, cache_dir):
+        ml, line = sl.build_line1(_MOCK_DATA, tier=0)
+        assert not set("◆◇") & set(line)  # no bar
+        assert all(t in line for t in _LINE1_TOKENS)
 
-    def test_remaining_tokens(self):
+    def test_remaining_tokens(self, cache_dir):
         # eff = 200000 - 33000 = 167000, used = 75000, remaining = 92000
-        ml, line = sl.build_line1(self.MOCK_DATA, tier=1)
+        ml, line = sl.build_line1(_MOCK_DATA, tier=1)
         assert "92k▼" in line
 
-    def test_duration_shown(self):
-        ml, line = sl.build_line1(self.MOCK_DATA, tier=1)
+    def test_duration_shown(self, cache_dir):
+        ml, line = sl.build_line1(_MOCK_DATA, tier=1)
         # 1200000ms = 20m
         assert "20m" in line
 
-    def test_model_colored_by_limit(self):
+    def test_model_colored_by_limit(self, cache_dir):
         # Write limits with high opus utilization
         lim = {"seven_day": {"utilization": 50}, "seven_day_opus": {"utilization": 85}}
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
-        ml, line = sl.build_line1(self.MOCK_DATA)
+        (cache_dir / "limits.json").write_text(json.dumps(lim))
+        ml, line = sl.build_line1(_MOCK_DATA)
         # Model name should be colored red (85% >= 80%)
         assert "31m" in line  # red
         assert "Opus 4.6" in line
@@ -297,90 +306,80 @@ class TestBuildLine1:
 # ═══════════════════════ build_line2 ═══════════════════════
 
 class TestBuildLine2:
-    def setup_method(self):
-        self._orig = sl.CACHE_DIR
-        sl.CACHE_DIR = Path(tempfile.mkdtemp())
+    @staticmethod
+    def _write_limits(cache_dir, **kw):
+        """Write limits.json: 5h 40% / 7d 50%, with per-key overrides from kw."""
+        body = json.dumps({**_LIMITS_BASE, **kw}).encode() if kw else _LIMITS_BASE_BYTES
+        (cache_dir / "limits.json").write_bytes(body)
 
-    def teardown_method(self):
-        import shutil
-        shutil.rmtree(sl.CACHE_DIR, ignore_errors=True)
-        sl.CACHE_DIR = self._orig
-
-    def test_no_limits_cache(self):
+    def test_no_limits_cache(self, cache_dir, offline):
         result = sl.build_line2()
         assert "—" in result
 
-    def test_with_limits(self):
-        lim = {
-            "five_hour": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 30, "resets_at": "2099-12-31T23:59:59Z"},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
+    def test_with_limits(self, cache_dir, offline):
+        self._write_limits(
+            cache_dir,
+            five_hour={"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
+            seven_day={"utilization": 30, "resets_at": "2099-12-31T23:59:59Z"},
+        )
         result = sl.build_line2()
         assert "◼" in result  # 5h bar shown
         assert "30%" in result  # weekly % shown
 
-    def test_all_model_sublimits(self):
+    def test_all_model_sublimits(self, cache_dir, offline):
         """All three model sub-limits are displayed."""
-        lim = {
-            "five_hour": {"utilization": 40, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day_opus": {"utilization": 45},
-            "seven_day_sonnet": {"utilization": 62},
-            "seven_day_haiku": {"utilization": 10},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
+        self._write_limits(
+            cache_dir,
+            seven_day_opus={"utilization": 45},
+            seven_day_sonnet={"utilization": 62},
+            seven_day_haiku={"utilization": 10},
+        )
         result = sl.build_line2()
-        assert "O:45" in result
-        assert "S:62" in result
-        assert "H:10" in result
+        for tok in ("O:45", "S:62", "H:10"):
+            assert tok in result
 
-    def test_missing_sublimits_show_dash(self):
+    def test_missing_sublimits_show_dash(self, cache_dir, offline):
         """Missing model sub-limits show dash."""
-        lim = {
-            "five_hour": {"utilization": 40, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day_opus": {"utilization": 45},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
+        self._write_limits(cache_dir, seven_day_opus={"utilization": 45})
         result = sl.build_line2()
-        assert "O:45" in result
-        assert "S:—" in result
-        assert "H:—" in result
+        for tok in ("O:45", "S:—", "H:—"):
+            assert tok in result
 
-    def test_ultra_no_bars(self):
+    def test_reset_countdown_uses_now(self, cache_dir, offline):
+        lim = {"five_hour": {"utilization": 10, "resets_at": "2026-02-14T22:30:00Z"}}
+        (cache_dir / "limits.json").write_text(json.dumps(lim))
+        now = datetime(2026, 2, 14, 20, 0, tzinfo=timezone.utc)
+        result = sl.build_line2(tier=0, now_utc=now)
+        assert " 2:30 " in result
+
+    def test_ultra_no_bars(self, cache_dir, offline):
         """Ultra mode has no bars and no pie."""
-        lim = {
-            "five_hour": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 30, "resets_at": "2099-12-31T23:59:59Z"},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
+        self._write_limits(
+            cache_dir,
+            five_hour={"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
+            seven_day={"utilization": 30, "resets_at": "2099-12-31T23:59:59Z"},
+        )
         result = sl.build_line2(tier=0)
         assert "◼" not in result  # no bar chars
         assert "○" not in result  # no pie
-        assert "50%" in result
-        assert "30%" in result
+        for tok in ("50%", "30%"):
+            assert tok in result
 
-    def test_no_padding(self):
+    def test_no_padding(self, cache_dir, offline):
         """Line 2 should not start with padding dots."""
-        lim = {
-            "five_hour": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 30, "resets_at": "2099-12-31T23:59:59Z"},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
+        self._write_limits(
+            cache_dir,
+            five_hour={"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
+            seven_day={"utilization": 30, "resets_at": "2099-12-31T23:59:59Z"},
+        )
         result = sl.build_line2()
-        import re
-        clean = re.sub(r'\033\[[0-9;]*m', '', result)
+        clean = _ANSI_RE.sub("", result)
         assert clean.startswith("5h:")
 
-    def test_spending_in_output(self):
+    def test_spending_in_output(self, cache_dir):
         """Spending data (1d/7d/30d) appears in line 2."""
-        lim = {
-            "five_hour": {"utilization": 40, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
-        today = datetime.now().strftime("%Y-%m-%d")
+        self._write_limits(cache_dir)
+        today = date.today().isoformat()
         ccdata = {
             "daily": [
                 {
@@ -393,21 +392,16 @@ class TestBuildLine2:
                 }
             ]
         }
-        (sl.CACHE_DIR / "ccusage.json").write_text(json.dumps(ccdata))
+        (cache_dir / "ccusage.json").write_text(json.dumps(ccdata))
         result = sl.build_line2()
-        assert "1d:" in result
-        assert "7d:" in result
-        assert "30d:" in result
-        assert "$12" in result or "$13" in result
+        for tok in ("1d:", "7d:", "30d:"):
+            assert tok in result
+        assert any(tag in result for tag in ("$12", "$13"))
 
-    def test_instances_format(self):
+    def test_instances_format(self, cache_dir):
         """Test --instances format: {"projects": {...}}."""
-        lim = {
-            "five_hour": {"utilization": 40, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
-        today = datetime.now().strftime("%Y-%m-%d")
+        self._write_limits(cache_dir)
+        today = date.today().isoformat()
         ccdata = {
             "projects": {
                 "-Users-test-projectA": [
@@ -421,117 +415,274 @@ class TestBuildLine2:
             },
             "totals": {"totalCost": 12.0},
         }
-        (sl.CACHE_DIR / "ccusage.json").write_text(json.dumps(ccdata))
+        (cache_dir / "ccusage.json").write_text(json.dumps(ccdata))
         result = sl.build_line2()
         assert "$12" in result  # Global total
 
-    def test_sparkline_in_output(self):
+    def test_cost_windows(self, cache_dir):
+        """Entries are bucketed into 1d/7d/30d windows; older ones are ignored."""
+        (cache_dir / "limits.json").write_text("{}")
+        today = date.today()
+        ccdata = {"daily": [
+            {"date": (today - timedelta(days=n)).isoformat(), "totalCost": cost}
+            for n, cost in ((0, 1.0), (3, 10.0), (20, 100.0), (40, 1000.0))
+        ]}
+        (cache_dir / "ccusage.json").write_text(json.dumps(ccdata))
+        result = sl.build_line2(tier=0)
+        assert "1d:$1 7d:$11 30d:$111" in result
+
+    def test_sparkline_in_output(self, cache_dir):
         """Sparkline appears in output when there's daily cost data."""
-        lim = {
-            "five_hour": {"utilization": 40, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
-        from datetime import timedelta
-        ccdata = {"daily": []}
-        for i in range(7):
-            d = (datetime.now() - timedelta(days=6 - i)).strftime("%Y-%m-%d")
-            ccdata["daily"].append({
+        self._write_limits(cache_dir)
+        today = date.today()
+        dates = [(today - timedelta(days=6 - i)).isoformat() for i in range(7)]
+        ccdata = {"daily": [
+            {
                 "date": d,
                 "inputTokens": 10000,
                 "outputTokens": 5000,
                 "cacheCreationTokens": 20000,
                 "totalCost": (i + 1) * 5.0,
                 "modelBreakdowns": [],
-            })
-        (sl.CACHE_DIR / "ccusage.json").write_text(json.dumps(ccdata))
+            }
+            for i, d in enumerate(dates)
+        ]}
+        (cache_dir / "ccusage.json").write_text(json.dumps(ccdata))
         result = sl.build_line2(tier=2)
-        assert any(c in result for c in "▁▂▃▄▅▆▇█")
+        assert set(result) & set("▁▂▃▄▅▆▇█")
 
-    def test_no_spending_cache(self):
+    def test_no_spending_cache(self, cache_dir, offline):
         """When no ccusage cache, spending shows dashes."""
-        lim = {
-            "five_hour": {"utilization": 40, "resets_at": "2099-12-31T23:59:59Z"},
-            "seven_day": {"utilization": 50, "resets_at": "2099-12-31T23:59:59Z"},
-        }
-        (sl.CACHE_DIR / "limits.json").write_text(json.dumps(lim))
-        with patch.object(sl, "refresh_ccusage", lambda cf: None):
-            result = sl.build_line2()
-        assert "1d: —" in result
-        assert "7d: —" in result
-        assert "30d: —" in result
+        self._write_limits(cache_dir)
+        result = sl.build_line2()
+        for tok in ("1d: —", "7d: —", "30d: —"):
+            assert tok in result
 
 
 # ═══════════════════════ log_session ═══════════════════════
 
 class TestLogSession:
-    def setup_method(self):
-        self._orig = sl.CACHE_DIR
-        sl.CACHE_DIR = Path(tempfile.mkdtemp())
-
-    def teardown_method(self):
-        import shutil
-        shutil.rmtree(sl.CACHE_DIR, ignore_errors=True)
-        sl.CACHE_DIR = self._orig
-
-    def test_creates_log_entry(self):
+    def test_creates_log_entry(self, cache_dir):
         data = {
             "model": {"id": "claude-opus-4-6"},
             "context_window": {"total_input_tokens": 100000, "total_output_tokens": 30000},
             "cost": {"total_cost_usd": 5.0, "total_duration_ms": 600000},
         }
         sl.log_session(data)
-        log_f = sl.CACHE_DIR / "sessions.jsonl"
+        log_f = cache_dir / "sessions.jsonl"
         assert log_f.exists()
         entry = json.loads(log_f.read_text().strip())
         assert entry["m"] == "opus"
         assert entry["c"] == 5.0
         assert entry["t"] == 130000
 
-    def test_throttle_60s(self):
+    def test_throttle_60s(self, cache_dir):
         data = {
             "model": {"id": "claude-opus-4-6"},
             "context_window": {"total_input_tokens": 50000, "total_output_tokens": 10000},
             "cost": {"total_cost_usd": 2.0, "total_duration_ms": 300000},
         }
-        sl.log_session(data)
-        sl.log_session(data)  # Should be throttled
-        log_f = sl.CACHE_DIR / "sessions.jsonl"
+        # First call only stamps the write time; the second checks it 30s later
+        with patch.object(sl.time, "time", side_effect=[1000.0, 1030.0]):
+            sl.log_session(data)
+            sl.log_session(data)  # Should be throttled
+        log_f = cache_dir / "sessions.jsonl"
         lines = log_f.read_text().strip().splitlines()
         assert len(lines) == 1  # Only one entry due to throttle
 
+    def test_throttle_expires_after_60s(self, cache_dir):
+        data = {
+            "model": {"id": "claude-opus-4-6"},
+            "context_window": {"total_input_tokens": 50000, "total_output_tokens": 10000},
+            "cost": {"total_cost_usd": 2.0, "total_duration_ms": 300000},
+        }
+        # Second call: throttle check at 1070, then its own write stamp
+        with patch.object(sl.time, "time", side_effect=[1000.0, 1070.0, 1070.0]):
+            sl.log_session(data)
+            sl.log_session(data)
+        lines = (cache_dir / "sessions.jsonl").read_text().strip().splitlines()
+        assert len(lines) == 2
+
+    def test_trim_log_keeps_tail(self, cache_dir):
+        log_f = cache_dir / "sessions.jsonl"
+        log_f.write_text("".join(f'{{"i":{i}}}\n' for i in range(30)))
+        sl.trim_log(log_f, 10)
+        lines = log_f.read_text().splitlines()
+        assert lines == [f'{{"i":{i}}}' for i in range(20, 30)]
+
+    def test_trim_log_partial_tail(self, cache_dir):
+        # File larger than the tail window: partial first line must be dropped
+        log_f = cache_dir / "sessions.jsonl"
+        log_f.write_text("".join(f'{{"i":{i},"pad":"{"x" * 90}"}}\n' for i in range(100)))
+        sl.trim_log(log_f, 10)
+        lines = log_f.read_text().splitlines()
+        assert len(lines) == 10
+        assert json.loads(lines[-1])["i"] == 99
+        assert all(json.loads(l) for l in lines)
+
+    def test_show_stats(self, cache_dir, capsys):
+        log_f = cache_dir / "sessions.jsonl"
+        log_f.write_text(
+            '{"ts":"2026-02-14T10:00:00Z","m":"opus","c":1.5,"t":1000,"d":0,"p":"a"}\n'
+            'garbage\n'
+            '{"ts":"2026-02-14T11:00:00Z","m":"opus","c":3.0,"t":2000,"d":0,"p":"b"}\n'
+        )
+        sl.show_stats()
+        out = capsys.readouterr().out
+        assert "Entries: 2" in out
+        assert "prj: a, b" in out
+
 
 # ═══════════════════════ rjson ═══════════════════════
 
 class TestRjson:
-    def test_valid(self):
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as f:
-            json.dump({"key": "value"}, f)
-            f.flush()
-            result = sl.rjson(Path(f.name))
-        assert result == {"key": "value"}
-        Path(f.name).unlink()
-
-    def test_missing(self):
-        assert sl.rjson(Path("/nonexistent/file.json")) is None
-
-    def test_invalid_json(self):
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as f:
-            f.write("not json")
-            f.flush()
-            result = sl.rjson(Path(f.name))
-        assert result is None
-        Path(f.name).unlink()
+    def test_valid(self, tmp_path):
+        p = tmp_path / "a.json"
+        p.write_text(json.dumps({"key": "value"}))
+        assert sl.rjson(p) == {"key": "value"}
+
+    def test_missing(self, tmp_path):
+        assert sl.rjson(tmp_path / "file.json") is None
+
+    def test_memoized_until_changed(self, tmp_path):
+        p = tmp_path / "a.json"
+        p.write_text(json.dumps({"k": 1}))
+        first = sl.rjson(p)
+        assert sl.rjson(p) is first  # served from cache
+        p.write_text(json.dumps({"k": 22}))
+        assert sl.rjson(p) == {"k": 22}
+
+    def test_rjson_orjson_backend(self, tmp_path):
+        # ~1 MB ccusage-shaped payload takes the large-file decoder (orjson if
+        # installed); it must agree with stdlib json, incl. non-ASCII and floats.
+        daily = [
+            {"date": f"2026-01-{i % 28 + 1:02d}", "inputTokens": i * 1013,
+             "outputTokens": i * 7, "totalCost": i / 3, "project": "проект-é",
+             "modelBreakdowns": [{"modelName": "claude-opus-4-6", "cost": i / 7}]}
+            for i in range(5000)
+        ]
+        text = json.dumps({"daily": daily, "totals": {"totalCost": 1.5}}, ensure_ascii=False)
+        assert len(text) > 1_000_000
+        p = tmp_path / "ccusage.json"
+        p.write_text(text, encoding="utf-8")
+        assert sl.rjson(p) == json.loads(text)
+
+    def test_invalid_json(self, tmp_path):
+        p = tmp_path / "a.json"
+        p.write_text("not json")
+        assert sl.rjson(p) is None
 
 
 # ═══════════════════════ is_stale ═══════════════════════
 
 class TestIsStale:
-    def test_missing_file(self):
-        assert sl.is_stale(Path("/nonexistent"), 60) is True
-
-    def test_fresh_file(self):
-        with tempfile.NamedTemporaryFile(delete=False) as f:
-            f.write(b"x")
-        assert sl.is_stale(Path(f.name), 60) is False
-        Path(f.name).unlink()
+    def test_missing_file(self, tmp_path):
+        assert sl.is_stale(tmp_path / "limits.json", 60) is True
+
+    def test_fresh_file(self, tmp_path):
+        p = tmp_path / "x"
+        p.write_bytes(b"x")
+        assert sl.is_stale(p, 60) is False
+
+
+# ═══════════════════════ _bg_refresh ═══════════════════════
+
+class TestBgRefresh:
+    def test_fresh_lock_skips_fork(self, tmp_path):
+        path = tmp_path / "ccusage.json"
+        path.with_suffix(".bglock").write_text("1")
+        with patch.object(sl.os, "fork", side_effect=AssertionError("forked")):
+            sl._bg_refresh(path, lambda cf: None)
+
+    def test_stale_lock_is_replaced(self, tmp_path):
+        path = tmp_path / "ccusage.json"
+        lk = path.with_suffix(".bglock")
+        lk.write_text("1")
+        os.utime(lk, (1000, 1000))
+        with patch.object(sl.os, "fork", return_value=12345) as fork:
+            sl._bg_refresh(path, lambda cf: None)
+        assert fork.called
+        assert lk.read_text() == str(os.getpid())
+
+
+# ═══════════════════════ refresh_pricing ═══════════════════════
+
+class TestRefreshPricing:
+    class FakeResp:
+        def __init__(self, body, headers):
+            self.body, self.headers = body, headers
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def read(self):
+            return self.body
+
+    def test_keeps_only_claude_fields(self, tmp_path):
+        payload = {
+            "claude-opus-4-6": {"input_cost_per_token": 5e-06, "output_cost_per_token": 2.5e-05,
+                                "max_tokens": 32000, "litellm_provider": "anthropic"},
+            "gpt-4o": {"input_cost_per_token": 2.5e-06},
+        }
+        resp = self.FakeResp(json.dumps(payload).encode(), {})
+        cf = tmp_path / "pricing.json"
+        with patch.object(sl, "_http_open", lambda url, headers: resp):
+            sl.refresh_pricing(cf)
+        assert json.loads(cf.read_text()) == {
+            "claude-opus-4-6": {"input_cost_per_token": 5e-06, "output_cost_per_token": 2.5e-05},
+        }
+
+    def test_not_modified_touches_cache(self, tmp_path):
+        sent = []
+
+        def fake_open(url, headers):
+            sent.append(headers)
+            if len(sent) == 1:
+                return self.FakeResp(b'{"claude-x": {}}', {"ETag": '"abc"'})
+            raise urllib.error.HTTPError(url, 304, "Not Modified", {}, None)
+
+        cf = tmp_path / "pricing.json"
+        with patch.object(sl, "_http_open", fake_open):
+            sl.refresh_pricing(cf)
+            os.utime(cf, (1000, 1000))
+            sl.refresh_pricing(cf)
+        assert sent == [{}, {"If-None-Match": '"abc"'}]
+        assert cf.stat().st_mtime > 1000
+        assert json.loads(cf.read_text()) == {"claude-x": {}}
+
+    def test_failed_write_leaves_no_validators(self, tmp_path):
+        resp = self.FakeResp(b'{"claude-x": {}}', {"ETag": '"abc"'})
+        cf = tmp_path / "pricing.json"
+        cf.with_suffix(".tmp").mkdir()  # tmp.write_bytes() fails
+        with patch.object(sl, "_http_open", lambda url, headers: resp):
+            sl.refresh_pricing(cf)
+        assert not cf.exists()
+        assert not cf.with_suffix(".lastmod").exists()
+
+
+# ═══════════════════════ prewarm_caches ═══════════════════════
+
+class TestPrewarm:
+    def test_runs_each_cache_refresher(self, cache_dir, monkeypatch):
+        def write(cf):
+            cf.write_text("{}")
+
+        async def write_async(cf):
+            cf.write_text("{}")
+
+        monkeypatch.setattr(sl, "refresh_pricing", write)
+        monkeypatch.setattr(sl, "refresh_limits", write)
+        monkeypatch.setattr(sl, "refresh_ccusage_async", write_async)
+        sl.prewarm_caches()
+        assert sorted(p.name for p in cache_dir.iterdir()) == [
+            "ccusage.json", "limits.json", "pricing.json"]
+
+    def test_write_ccusage_skips_empty_output(self, tmp_path):
+        cf = tmp_path / "ccusage.json"
+        sl._write_ccusage(cf, b"  \n")
+        assert not cf.exists()
+        sl._write_ccusage(cf, b'{"daily": []}')
+        assert sl.rjson(cf) == {"daily": []}